@@ -200,6 +200,8 @@ func (l *CogSDXL) GetCommand(ctx context.Context, sessionFilter types.SessionFil
 		fmt.Sprintf("API_HOST=%s", API_HOST),
 		// one day it will need to auth to the API server to download LoRAs
 		fmt.Sprintf("API_TOKEN=%s", API_TOKEN),
+		// the wrapper only dumps whole tasks and sessions at debug level
+		fmt.Sprintf("LOG_LEVEL=%s", os.Getenv("LOG_LEVEL")),
 		"PYTHONUNBUFFERED=1",
 	}
 
@@ -10,6 +10,7 @@ import time
 import json
 import shutil
 import tempfile
+import pprint
 from pathlib import Path
 
 # we get copied into the cog-sdxl folder so assume these modules are available
@@ -18,6 +19,18 @@ from train import train
 from predict import Predictor
 import zipfile
 
+# tasks, sessions and training outputs can be large and every line we print is
+# scanned by the runner's output chunker, so only dump them when debugging
+# LOG_LEVEL is forwarded from the runner, which parses it with zerolog
+DEBUG = os.environ.get("LOG_LEVEL", "").lower() in ("debug", "trace")
+
+def debug_pprint(obj):
+    if DEBUG:
+        pprint.pprint(obj)
+
+# reuse one keep-alive connection to poll the runner
+client = requests.Session()
+
 def create_zip_file(directory, output_file):
     with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
         for root, dirs, files in os.walk(directory):
@@ -42,7 +55,12 @@ class CogTrainer:
 
 
     def run(self):
-        response = requests.get(getJobURL)
+        while True:
+            try:
+                response = client.get(self.getJobURL, timeout=10)
+                break
+            except requests.exceptions.RequestException:
+                time.sleep(0.1)
         if response.status_code != 200:
             time.sleep(0.1)
             # TODO: should we retry here?
@@ -54,7 +72,7 @@ class CogTrainer:
         task = json.loads(response.content)
 
         print("🟡 SDXL Finetine Job --------------------------------------------------\n")
-        print(task)
+        debug_pprint(task)
 
         session_id = task["session_id"]
         dataset_dir = task["dataset_dir"]
@@ -114,9 +132,10 @@ class CogTrainer:
         )
         # TODO: do something with output
 
-        print(f"--------------- OUTPUT ------------------")
-        import pprint; pprint.pprint(output)
-        print(f"-----------------------------------------")
+        if DEBUG:
+            print(f"--------------- OUTPUT ------------------")
+            pprint.pprint(output)
+            print(f"-----------------------------------------")
 
         # move result into ./training_dir
         Path("./trained_model.tar").rename(f"{training_dir}/trained_model.tar")
@@ -158,14 +177,18 @@ class CogInference:
         # rather waiting until it appears so we can know what lora weights to
         # load (if any)
         while waiting_for_initial_session:
-            response = requests.get(self.readSessionURL)
+            try:
+                response = client.get(self.readSessionURL, timeout=10)
+            except requests.exceptions.RequestException:
+                time.sleep(0.1)
+                continue
             if response.status_code != 200:
                 time.sleep(0.1)
                 continue
             
             session = json.loads(response.content)
             print("🟡 GOT SESSION --------------------------------------------------\n")
-            import pprint; pprint.pprint(session)
+            debug_pprint(session)
             # pick out the latest interaction with a lora_dir - that is the path
             # we need in the filestore starting with 'dev/...'
             lora_api_path = None
@@ -202,7 +225,11 @@ class CogInference:
     def mainLoop(self):
         # TODO: poll the local helix runner API for jobs
         while True:
-            response = requests.get(self.getJobURL)
+            try:
+                response = client.get(self.getJobURL, timeout=10)
+            except requests.exceptions.RequestException:
+                time.sleep(0.1)
+                continue
             if response.status_code != 200:
                 time.sleep(0.1)
                 continue
@@ -214,7 +241,7 @@ class CogInference:
             session_id = task["session_id"]
 
             print("🟡 SDXL Job --------------------------------------------------\n")
-            print(task)
+            debug_pprint(task)
 
             print(f" [SESSION_START]session_id={session_id} ", file=sys.stdout)
 
@@ -9,6 +9,9 @@ def print(*args, **kwargs):
     kwargs['flush'] = True
     return builtins.print(*args, **kwargs)
 
+# reuse one keep-alive connection to poll the runner
+client = requests.Session()
+
 def do_inference():
     getJobURL = os.environ.get("HELIX_NEXT_TASK_URL", None)
     readSessionURL = os.environ.get("HELIX_INITIAL_SESSION_URL", "")
@@ -25,7 +28,11 @@ def do_inference():
     waiting_for_initial_session = True
 
     while waiting_for_initial_session:
-        response = requests.get(readSessionURL)
+        try:
+            response = client.get(readSessionURL, timeout=10)
+        except requests.exceptions.RequestException:
+            time.sleep(0.1)
+            continue
         if response.status_code != 200:
             time.sleep(0.1)
             continue
@@ -39,7 +46,11 @@ def do_inference():
     while True:
         currentJobData = ""
 
-        response = requests.get(getJobURL)
+        try:
+            response = client.get(getJobURL, timeout=10)
+        except requests.exceptions.RequestException:
+            time.sleep(0.1)
+            continue
 
         if response.status_code != 200:
             time.sleep(0.1)
@@ -1,71 +1,133 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request
+from flask_compress import Compress
+import codecs
+import http.cookiejar
+import importlib
+import orjson
 import os
-from unstructured.partition.auto import partition
-from unstructured.documents.elements import NarrativeText
-from unstructured.chunking.title import chunk_by_title
+import shutil
 import tempfile
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
-import html2text
 
 app = Flask(__name__)
 
+# extracted text compresses well, gzip it for clients that accept it (Go's
+# http client does so transparently) but leave small error bodies alone
+app.config['COMPRESS_MIN_SIZE'] = 4096
+app.config['COMPRESS_LEVEL'] = 5
+Compress(app)
+
+# share one connection pool across requests so repeat fetches from the same
+# host reuse keep-alive connections instead of a new TCP+TLS handshake.
+# under gunicorn --preload this is built in the master before fork, which is
+# safe because the pool opens no sockets until the first download and those
+# only ever happen in the workers
+session = requests.Session()
+# fetches for different users' documents share this session, so never keep
+# cookies between them (redirects within one fetch still carry their cookies)
+session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+# say who we are so origins can tell extraction traffic apart
+session.headers['User-Agent'] = f"helix-text-extractor {requests.utils.default_user_agent()}"
+adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=Retry(total=2, backoff_factor=0.2))
+session.mount('http://', adapter)
+session.mount('https://', adapter)
+
 def download_url(url):
-  response = requests.get(url)
+  # stream the body so callers decide whether it goes to memory or to disk
+  response = session.get(url, stream=True, timeout=(5, 30))
   if response.status_code == 200:
-    temp_file = tempfile.NamedTemporaryFile(delete=False)
-    temp_file.write(response.content)
-    temp_file.close()
-    return temp_file.name, response.headers.get('Content-Type')
+    return response, response.headers.get('Content-Type', '')
   else:
+    response.close()
     raise Exception(f"Download failed with {response.status_code}")
 
+# documents that reach unstructured are mostly multi-MB PDFs and office files,
+# copy them in large chunks to keep the number of read/write syscalls down
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# documents up to this size are kept in memory and handed to unstructured as a
+# file object, only larger ones get written out to disk
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+def spool_to_temp_file(response):
+  # copy the body into a temporary file that only touches disk once it grows
+  # past SPOOL_MAX_SIZE, rather than buffering it all as one bytes object
+  response.raw.decode_content = True
+  temp_file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, buffering=COPY_BUFFER_SIZE)
+  shutil.copyfileobj(response.raw, temp_file, COPY_BUFFER_SIZE)
+  temp_file.seek(0)
+  return temp_file
+
 # set to false to use html2text
 USE_BEAUTIFUL_SOUP = False
 
+# returned as-is rather than going through unstructured.partition
+PLAIN_TEXT_MIME_TYPES = ("text/plain", "text/markdown", "application/json")
+
+def charset_from_mime_type(mimeType):
+  # e.g. "text/html; charset=ISO-8859-1"
+  for param in mimeType.split(";")[1:]:
+    key, _, value = param.strip().partition("=")
+    if key.lower() == "charset" and value:
+      try:
+        return codecs.lookup(value.strip('"')).name
+      except LookupError:
+        break
+  return "utf-8"
+
 def parse_document(url):
 
-  # download url to temporary location
-  fname, mimeType = download_url(url)
+  response, mimeType = download_url(url)
 
-  print(f"Got mimeType {mimeType}")
-  if mimeType.startswith("text/html"):
-    if USE_BEAUTIFUL_SOUP:
-      # beautiful soup does a better job of this
-      gfg = BeautifulSoup(open(fname).read())
+  with response:
+    print(f"Got mimeType {mimeType}")
+    if mimeType.startswith(PLAIN_TEXT_MIME_TYPES):
+      # already text - no need to load unstructured's partitioners for this
+      return response.content.decode(charset_from_mime_type(mimeType), errors="replace")
 
-      maybeArticle = gfg.find('article')
-      if maybeArticle:
-        # Extracting data for article section
-        bodyHtml = maybeArticle
-      else:
-        bodyHtml = gfg
-  
-      # Calculating result
-      res = bodyHtml.get_text()
+    if mimeType.startswith("text/html"):
+      # html is parsed from memory so it never needs a temporary file
+      raw = response.content
+
+      if USE_BEAUTIFUL_SOUP:
+        # beautiful soup does a better job of this
+        # lxml is a C parser and much faster than the default html.parser
+        gfg = BeautifulSoup(raw, "lxml")
 
-      os.unlink(fname)
-      return res
-    else:
-      h = html2text.HTML2Text()
-      h.ignore_links = True
-      h.body_width = 0
-      h.images_to_alt = True
-      return h.handle(open(fname).read())
+        maybeArticle = gfg.find('article')
+        if maybeArticle:
+          # Extracting data for article section
+          bodyHtml = maybeArticle
+        else:
+          bodyHtml = gfg
 
+        # Calculating result
+        return bodyHtml.get_text()
+      else:
+        import html2text
+        h = html2text.HTML2Text()
+        h.ignore_links = True
+        h.body_width = 0
+        h.images_to_alt = True
+        return h.handle(raw.decode(charset_from_mime_type(mimeType), errors="replace"))
 
-  # otherwise fall back to unstructured
+    # otherwise fall back to unstructured
+    temp_file = spool_to_temp_file(response)
 
-  elements = partition(filename=fname)
-  text = ""
-  for element in elements:
-    if isinstance(element, NarrativeText):
-      text += element.text + "\n"
+  with temp_file:
+    # unstructured pulls in a lot of parsing and model code, only pay for it
+    # once a document actually needs partitioning
+    from unstructured.partition.auto import partition
+    from unstructured.documents.elements import NarrativeText
 
-  os.unlink(fname)
-  return text
+    elements = partition(file=temp_file)
+    return "".join(element.text + "\n" for element in elements if isinstance(element, NarrativeText))
 
   # if we want unstructured to do the splitting then we mess with this
+  # from unstructured.chunking.title import chunk_by_title
   # chunks = chunk_by_title(
   #   elements=elements,
   # )
@@ -73,10 +135,29 @@ def parse_document(url):
   # return texts
 
 
+def preload_unstructured():
+  # partition.auto only imports each format's partitioner the first time a
+  # document of that type shows up, pull in the common ones up front so the
+  # first request for them doesn't stall for seconds
+  importlib.import_module("unstructured.partition.auto")
+  for fileType in ("pdf", "docx", "pptx", "xlsx"):
+    importlib.import_module(f"unstructured.partition.{fileType}")
+
+# only the gunicorn command line turns this on (with --preload) so the imports
+# happen once in the master and are shared with the forked workers, the flask
+# dev server keeps importing lazily
+if os.environ.get("PRELOAD_UNSTRUCTURED", "") == "1":
+  preload_unstructured()
+
+def ojsonify(obj, status=200):
+  # like flask's jsonify but encoded with orjson, which goes straight to bytes
+  # and is much faster than the stdlib json encoder on large extracted text
+  return app.response_class(orjson.dumps(obj), status=status, mimetype='application/json')
+
 @app.route('/api/v1/extract', methods=['POST'])
 def extract_file():
   if 'url' not in request.json:
-    return jsonify({"error": "No 'url' field in the request"}), 400
+    return ojsonify({"error": "No 'url' field in the request"}, 400)
   
   url = request.json['url']
 
@@ -86,9 +167,11 @@ def extract_file():
   print("-------------------------------------------")
   print(f"converted URL: {url} - length: {len(text)}")
   
-  return jsonify({
+  return ojsonify({
     "text": text,
-  }), 200
+  })
 
+# in the image we run under gunicorn (see the Dockerfile), this is only for
+# local development - set FLASK_DEBUG=1 to get the debugger and reloader
 if __name__ == '__main__':
-  app.run(debug=True, port=5000, host='0.0.0.0')
+  app.run(port=5000, host='0.0.0.0')